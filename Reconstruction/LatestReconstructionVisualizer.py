@@ -1,5 +1,6 @@
 import open3d as o3d
 import os
+import sys
 
 class PointCloudVisualizer:
     def __init__(self, reconstruction_folder="reconstruction_output"):
@@ -50,4 +51,6 @@ class PointCloudVisualizer:
 if __name__ == "__main__":
     visualizer = PointCloudVisualizer()
     pcd = visualizer.load_model()
+    if pcd is None:
+        sys.exit(1)
     visualizer.visualize(pcd)
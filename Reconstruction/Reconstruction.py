@@ -6,10 +6,6 @@ import time
 import copy
 import os
 
-# Habilitar soporte para GPU
-o3d.utility.set_verbosity_level(o3d.utility.VerbosityLevel.Debug)
-o3d.utility.set_global_jit_flag(True)
-
 class KinectReconstructor:
     def __init__(self):
         # Configure Kinect
@@ -29,6 +25,12 @@ class KinectReconstructor:
             637.134, 366.758  # cx, cy
         )
         
+        # Persistent buffers for the flipped frames; o3d.geometry.Image copies
+        # its input, so they can be reused every frame without reallocating
+        height, width = self.intrinsics.height, self.intrinsics.width
+        self._color_buf = np.empty((height, width, 3), dtype=np.uint8)
+        self._depth_buf = np.empty((height, width), dtype=np.uint16)
+        
         # Transformation to align with correct axis (floor down)
         self.flip_transform = np.array([
             [1,  0,  0, 0],
@@ -41,9 +43,27 @@ class KinectReconstructor:
         self.voxel_size = 0.01  # 1cm voxel size
         self.distance_threshold = 0.05  # 5cm threshold for ICP
         
+        # Registration settings depend only on the parameters above, so they
+        # are built once here rather than on every registered frame
+        registration = o3d.pipelines.registration
+        self.fpfh_search_param = o3d.geometry.KDTreeSearchParamHybrid(
+            radius=self.voxel_size * 5, max_nn=100
+        )
+        self.ransac_estimation = registration.TransformationEstimationPointToPoint(False)
+        self.ransac_checkers = [
+            registration.CorrespondenceCheckerBasedOnEdgeLength(0.9),
+            registration.CorrespondenceCheckerBasedOnDistance(self.distance_threshold * 2)
+        ]
+        # (max_iteration, confidence): RANSAC stops early once it reaches the
+        # confidence, the iteration count only bounds the worst case
+        self.ransac_criteria = registration.RANSACConvergenceCriteria(100000, 0.999)
+        self.icp_estimation = registration.TransformationEstimationPointToPlane()
+        self.icp_criteria = registration.ICPConvergenceCriteria(max_iteration=50)
+        
         # Storage for reconstruction
         self.global_model = o3d.geometry.PointCloud()
         self.previous_pcd = None
+        self.previous_features = None
         self.current_transformation = np.identity(4)
         
         # For tracking frames
@@ -64,9 +84,13 @@ class KinectReconstructor:
         print(f"Using device: {self.device}")
     
     def process_images(self, color_img, depth_img):
-        # Flip vertical and horizontal (if needed for your setup)
-        color_img = cv2.flip(color_img, -1)
-        depth_img = cv2.flip(depth_img, -1)
+        # Flip vertical and horizontal (if needed for your setup).
+        # The Kinect delivers BGRA; reversing the first three channels in the
+        # same strided view gives RGB, so flip and conversion cost one copy.
+        np.copyto(self._color_buf, color_img[::-1, ::-1, 2::-1])
+        cv2.flip(depth_img, -1, dst=self._depth_buf)
+        color_img = self._color_buf
+        depth_img = self._depth_buf
         
         # Convert to Open3D format
         color_o3d = o3d.geometry.Image(color_img)
@@ -82,16 +106,25 @@ class KinectReconstructor:
         )
         return rgbd
     
+    def create_point_cloud(self, rgbd):
+        # Open3D applies the inverse of the extrinsic while unprojecting each
+        # pixel; flip_transform is its own inverse, so the axis flip happens in
+        # the same pass instead of a second transform over every point
+        return o3d.geometry.PointCloud.create_from_rgbd_image(
+            rgbd, self.intrinsics, self.flip_transform
+        )
+    
     def preprocess_point_cloud(self, pcd):
         # Convertir a tensor para operaciones en GPU
         pcd_tensor = o3d.t.geometry.PointCloud.from_legacy(pcd)
         
-        # Remove outliers usando GPU
-        pcd_tensor = pcd_tensor.remove_statistical_outlier(nb_neighbors=20, std_ratio=2.0)
-        
-        # Downsample usando GPU
+        # Downsample usando GPU first, so the neighbour search below runs on
+        # ~1cm voxels instead of every depth pixel
         pcd_tensor = pcd_tensor.voxel_down_sample(self.voxel_size)
         
+        # Remove outliers usando GPU (returns the filtered cloud and a mask)
+        pcd_tensor, _ = pcd_tensor.remove_statistical_outliers(nb_neighbors=20, std_ratio=2.0)
+        
         # Compute normals usando GPU
         pcd_tensor.estimate_normals(
             max_nn=30,
@@ -101,47 +134,48 @@ class KinectReconstructor:
         # Convertir de vuelta a formato legacy
         return pcd_tensor.to_legacy()
     
-    def register_frames(self, source, target):
-        """Register source point cloud to target using point-to-plane ICP"""
-        
-        # Convertir a tensores para operaciones en GPU
-        source_tensor = o3d.t.geometry.PointCloud.from_legacy(source)
-        target_tensor = o3d.t.geometry.PointCloud.from_legacy(target)
+    def compute_features(self, pcd):
+        """Downsample a point cloud and compute its FPFH features for global registration"""
         
         # Downsample usando GPU
-        source_down = source_tensor.voxel_down_sample(self.voxel_size * 2)
-        target_down = target_tensor.voxel_down_sample(self.voxel_size * 2)
+        pcd_tensor = o3d.t.geometry.PointCloud.from_legacy(pcd)
+        pcd_down = pcd_tensor.voxel_down_sample(self.voxel_size * 2).to_legacy()
         
-        # Compute FPFH features usando GPU
-        source_fpfh = o3d.pipelines.registration.compute_fpfh_feature(
-            source_down.to_legacy(),
-            o3d.geometry.KDTreeSearchParamHybrid(radius=self.voxel_size * 5, max_nn=100)
-        )
-        target_fpfh = o3d.pipelines.registration.compute_fpfh_feature(
-            target_down.to_legacy(),
-            o3d.geometry.KDTreeSearchParamHybrid(radius=self.voxel_size * 5, max_nn=100)
+        # Compute FPFH features
+        pcd_fpfh = o3d.pipelines.registration.compute_fpfh_feature(
+            pcd_down, self.fpfh_search_param
         )
+        return pcd_down, pcd_fpfh
+    
+    def register_frames(self, source, target, source_features=None, target_features=None):
+        """Register source point cloud to target using point-to-plane ICP
         
-        # Fast global registration usando GPU
+        Features from compute_features can be passed in to avoid recomputing them.
+        """
+        if source_features is None:
+            source_features = self.compute_features(source)
+        if target_features is None:
+            target_features = self.compute_features(target)
+        source_down, source_fpfh = source_features
+        target_down, target_fpfh = target_features
+        
+        # Fast global registration
         result_fast = o3d.pipelines.registration.registration_ransac_based_on_feature_matching(
-            source_down.to_legacy(), target_down.to_legacy(),
+            source_down, target_down,
             source_fpfh, target_fpfh,
             mutual_filter=True,
             max_correspondence_distance=self.distance_threshold * 2,
-            estimation_method=o3d.pipelines.registration.TransformationEstimationPointToPoint(False),
+            estimation_method=self.ransac_estimation,
             ransac_n=4,
-            checkers=[
-                o3d.pipelines.registration.CorrespondenceCheckerBasedOnEdgeLength(0.9),
-                o3d.pipelines.registration.CorrespondenceCheckerBasedOnDistance(self.distance_threshold * 2)
-            ],
-            criteria=o3d.pipelines.registration.RANSACConvergenceCriteria(4000000, 500)
+            checkers=self.ransac_checkers,
+            criteria=self.ransac_criteria
         )
         
         # Point-to-plane ICP usando GPU
         result_icp = o3d.pipelines.registration.registration_icp(
             source, target, self.distance_threshold, result_fast.transformation,
-            o3d.pipelines.registration.TransformationEstimationPointToPlane(),
-            o3d.pipelines.registration.ICPConvergenceCriteria(max_iteration=50)
+            self.icp_estimation,
+            self.icp_criteria
         )
         
         return result_icp.transformation
@@ -149,13 +183,20 @@ class KinectReconstructor:
     def add_frame_to_model(self, new_pcd):
         # First frame becomes the initial model
         if len(self.global_model.points) == 0:
+            # new_pcd is only read from here on, so previous_pcd can share it
             self.global_model = copy.deepcopy(new_pcd)
-            self.previous_pcd = copy.deepcopy(new_pcd)
+            self.previous_pcd = new_pcd
+            self.previous_features = None
             return True
         
         # Register new frame to previous frame
         try:
-            transformation = self.register_frames(new_pcd, self.previous_pcd)
+            # The new frame's features are kept for the next registration,
+            # where this frame becomes the target
+            new_features = self.compute_features(new_pcd)
+            transformation = self.register_frames(
+                new_pcd, self.previous_pcd, new_features, self.previous_features
+            )
             
             # Apply transformation to align with global model
             self.current_transformation = np.matmul(self.current_transformation, transformation)
@@ -170,7 +211,8 @@ class KinectReconstructor:
                 self.global_model = self.global_model.voxel_down_sample(self.voxel_size)
             
             # Update previous frame
-            self.previous_pcd = copy.deepcopy(new_pcd)
+            self.previous_pcd = new_pcd
+            self.previous_features = new_features
             
             return True
         except Exception as e:
@@ -192,8 +234,7 @@ class KinectReconstructor:
         color = capture.color
         depth = capture.transformed_depth
         rgbd = self.process_images(color, depth)
-        initial_pcd = o3d.geometry.PointCloud.create_from_rgbd_image(rgbd, self.intrinsics)
-        initial_pcd.transform(self.flip_transform)
+        initial_pcd = self.create_point_cloud(rgbd)
         initial_pcd = self.preprocess_point_cloud(initial_pcd)
         
         # Add to visualizer
@@ -230,14 +271,18 @@ class KinectReconstructor:
             timestamp = time.strftime("%Y%m%d-%H%M%S")
             filename = f"{self.output_folder}/reconstruction_{timestamp}"
             
-            # Save as point cloud
-            o3d.io.write_point_cloud(f"{filename}.ply", self.global_model)
+            # Save as point cloud (Open3D writers return False instead of raising)
+            if not o3d.io.write_point_cloud(f"{filename}.ply", self.global_model):
+                print(f"Saving point cloud to {filename}.ply failed")
+                return True
             
             # Create and save mesh using Poisson reconstruction
             mesh = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(
                 self.global_model, depth=9, width=0, scale=1.1, linear_fit=False
             )[0]
-            o3d.io.write_triangle_mesh(f"{filename}.obj", mesh)
+            if not o3d.io.write_triangle_mesh(f"{filename}.obj", mesh):
+                print(f"Saving mesh to {filename}.obj failed")
+                return True
             
             print(f"Model saved to {filename}.ply and {filename}.obj")
             return True
@@ -264,21 +309,25 @@ class KinectReconstructor:
         print("(or just 'R', depending on how the key events are set up) while the window is active for the callback to trigger.")
 
 
-        last_time = time.time()
+        last_time = time.monotonic()
         fps_count = 0
         fps = 0
         
+        # Bind the per-frame SDK call once instead of resolving it every frame
+        get_capture = self.k4a.get_capture
+        
         while True:
             # FPS calculation
             fps_count += 1
-            if time.time() - last_time > 1.0:
+            now = time.monotonic()
+            if now - last_time > 1.0:
                 fps = fps_count
                 fps_count = 0
-                last_time = time.time()
+                last_time = now
                 print(f"FPS: {fps}, Recording: {'ON' if self.is_recording else 'OFF'}, Frames: {self.frame_count}")
             
             # Get new frame
-            capture = self.k4a.get_capture()
+            capture = get_capture()
             if capture.color is None or capture.transformed_depth is None:
                 continue
             
@@ -288,8 +337,7 @@ class KinectReconstructor:
             rgbd = self.process_images(color, depth)
             
             # Create and preprocess point cloud
-            new_pcd = o3d.geometry.PointCloud.create_from_rgbd_image(rgbd, self.intrinsics)
-            new_pcd.transform(self.flip_transform)
+            new_pcd = self.create_point_cloud(rgbd)
             new_pcd = self.preprocess_point_cloud(new_pcd)
             
             # Update visualization pcd
@@ -299,21 +347,27 @@ class KinectReconstructor:
             
             # Add to reconstruction model if recording
             if self.is_recording and self.frame_count % self.keyframe_interval == 2:  # Process every 5th frame
-                success = self.add_frame_to_model(copy.deepcopy(new_pcd))
+                success = self.add_frame_to_model(new_pcd)
                 if success:
                     print(f"Added frame {self.frame_count} to model, total points: {len(self.global_model.points)}")
             
             self.frame_count += 1
             
-            # Update visualizer
+            # Update visualizer; poll_events returns False once the window
+            # is closed (Esc or the close button), which ends the loop
             self.vis.update_geometry(pcd)
-            self.vis.poll_events()
+            if not self.vis.poll_events():
+                break
             self.vis.update_renderer()
     
     def cleanup(self):
         self.k4a.stop()
+        self.vis.destroy_window()
         print("Kinect stopped and program finished.")
 
 if __name__ == "__main__":
+    # Only warnings: Debug makes Open3D log every ICP/RANSAC step per keyframe
+    o3d.utility.set_verbosity_level(o3d.utility.VerbosityLevel.Warning)
+    
     reconstructor = KinectReconstructor()
     reconstructor.start_visualization()
@@ -1,5 +1,6 @@
 import open3d as o3d
 import os
+import sys
 
 class PointCloudVisualizer:
     def __init__(self, reconstruction_folder="reconstruction_output"):
@@ -53,7 +54,7 @@ if __name__ == "__main__":
     # List all .ply files in the reconstruction folder
     ply_files = visualizer.list_files()
     if ply_files is None:
-        exit()
+        sys.exit(1)
 
     # Print the list of files
     print("Available .ply files:")
@@ -67,8 +68,12 @@ if __name__ == "__main__":
             filename = ply_files[choice - 1]
             print(f"Loading: {filename}")
             pcd = visualizer.load_model(filename)
+            if pcd is None:
+                sys.exit(1)
             visualizer.visualize(pcd)
         else:
             print("Invalid choice. Exiting.")
+            sys.exit(1)
     except ValueError:
         print("Invalid input. Exiting.")
+        sys.exit(1)
@@ -2,7 +2,6 @@ import numpy as np
 import open3d as o3d
 from pyk4a import PyK4A, Config, ColorResolution, DepthMode
 import cv2
-import time
 
 # Configurar Kinect
 k4a = PyK4A(
@@ -26,7 +25,8 @@ while True:
 
 # Flip vertical y horizontal
 def process_images(color_img, depth_img):
-    color_img = cv2.flip(color_img, -1)
+    # BGRA -> RGB en la misma vista invertida: una sola copia
+    color_img = np.ascontiguousarray(color_img[::-1, ::-1, 2::-1])
     depth_img = cv2.flip(depth_img, -1)
 
     color_o3d = o3d.geometry.Image(color_img)
@@ -41,7 +41,9 @@ def process_images(color_img, depth_img):
     )
     return rgbd
 
-# Transformación para alinear con el eje correcto (suelo abajo)
+# Transformación para alinear con el eje correcto (suelo abajo).
+# Se pasa como extrínseca a create_from_rgbd_image (es su propia inversa),
+# así se aplica durante la proyección y no en una segunda pasada.
 flip_transform = np.array([
     [1,  0,  0, 0],
     [0, -1,  0, 0],
@@ -58,8 +60,7 @@ intrinsics = o3d.camera.PinholeCameraIntrinsic(
 color = capture.color
 depth = capture.transformed_depth
 rgbd = process_images(color, depth)
-pcd = o3d.geometry.PointCloud.create_from_rgbd_image(rgbd, intrinsics)
-pcd.transform(flip_transform)
+pcd = o3d.geometry.PointCloud.create_from_rgbd_image(rgbd, intrinsics, flip_transform)
 vis.add_geometry(pcd)
 
 # Configurar la cámara en la vista
@@ -76,6 +77,8 @@ ctr.set_zoom(0.5)
 # Loop de visualización en tiempo real
 try:
     while True:
+        # get_capture() bloquea hasta el siguiente frame de la cámara,
+        # así que marca el ritmo del bucle sin necesidad de sleep
         capture = k4a.get_capture()
         if capture.color is None or capture.transformed_depth is None:
             continue
@@ -84,16 +87,16 @@ try:
         depth = capture.transformed_depth
         rgbd = process_images(color, depth)
 
-        new_pcd = o3d.geometry.PointCloud.create_from_rgbd_image(rgbd, intrinsics)
-        new_pcd.transform(flip_transform)
+        new_pcd = o3d.geometry.PointCloud.create_from_rgbd_image(rgbd, intrinsics, flip_transform)
 
         pcd.points = new_pcd.points
         pcd.colors = new_pcd.colors
 
         vis.update_geometry(pcd)
-        vis.poll_events()
+        # poll_events devuelve False al cerrar la ventana (Esc o el botón)
+        if not vis.poll_events():
+            break
         vis.update_renderer()
-        time.sleep(0.03)
 
 except KeyboardInterrupt:
     print("Finalizando visualización.")
@@ -7,7 +7,6 @@ import plotly.graph_objects as go
 print("Load a ply point cloud, print it, and render it")
 ply_point_cloud = o3d.data.PLYPointCloud()
 pcd = o3d.io.read_point_cloud(ply_point_cloud.path)
-points = np.asarray(pcd.points)
 print(pcd)
 print(np.asarray(pcd.points))
 
@@ -15,7 +14,7 @@ print(np.asarray(pcd.points))
 
 print("Downsample the point cloud with a voxel of 0.02")
 downpcd = pcd.voxel_down_sample(voxel_size=0.02)
-ddown_points = np.asarray(downpcd.points)downpcd = pcd.voxel_down_sample(voxel_size=0.02)
+down_points = np.asarray(downpcd.points)
 
 # VISUALIZE
 